@@ -1,25 +1,19 @@
-from typing import Any, Optional
-import csv
-from datetime import datetime
-def record_result_csv(name: str, t: str, ok: bool, status: Any, resp_ms: Optional[float]) -> None:
-    log_dir = os.path.join(os.path.dirname(__file__), "logs")
-    os.makedirs(log_dir, exist_ok=True)
-    csv_path = os.path.join(log_dir, "monitor_results.csv")
-    now = datetime.now().isoformat()
-    with open(csv_path, "a", newline='', encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow([now, name, t, ok, status, resp_ms if resp_ms is not None else ""])
-
 import asyncio
-import subprocess
+import atexit
+import csv
+import io
 import os
+import socket
+import threading
 import time
 import logging
+from datetime import datetime
 from logging.handlers import RotatingFileHandler
 from typing import Any, Dict, List, Tuple, Optional
+import aiohttp
 from aiohttp import ClientSession
+from aiohttp.resolver import AsyncResolver, DefaultResolver
 from prometheus_client import start_http_server, Gauge
-import requests
 import yaml
 
 # --- 設定ゾーン（config.yamlから読み込み）
@@ -54,11 +48,71 @@ config = load_config()
 CHECK_INTERVAL = config.get("CHECK_INTERVAL", 15)
 DISCORD_WEBHOOK_URL = config.get("DISCORD_WEBHOOK_URL")
 MONITORED = config.get("MONITORED", [])
+MAX_CONCURRENT_CHECKS = config.get("MAX_CONCURRENT_CHECKS", 32)
+AUTORECOVER_COOLDOWN = config.get("AUTORECOVER_COOLDOWN", 300)
+CSV_FLUSH_INTERVAL = 5.0
+CSV_QUEUE_SIZE = 10000
+
+# --- 結果CSV：プロセス中開きっぱなしにして、MonitorAgentの書き込みタスクがまとめて書き込む
+# monitor.logのRotatingFileHandlerと同様にサイズでローテーションする
+CSV_MAX_BYTES = 50*1024*1024
+CSV_BACKUP_COUNT = 7
+_csv_dir = os.path.join(os.path.dirname(__file__), "logs")
+os.makedirs(_csv_dir, exist_ok=True)
+_csv_path = os.path.join(_csv_dir, "monitor_results.csv")
+_csv_lock = threading.Lock()
+# 1行ずつStringIOに整形してからUTF-8で書き込み、ファイルサイズをバイト単位で正確に追跡する
+_csv_row_buf = io.StringIO()
+_csv_writer = csv.writer(_csv_row_buf)
+
+def _open_result_csv() -> None:
+    global _csv_fh, _csv_size
+    _csv_fh = open(_csv_path, "ab", buffering=64*1024)
+    _csv_size = os.path.getsize(_csv_path)
+
+def _rotate_result_csv() -> None:
+    _csv_fh.close()
+    try:
+        for i in range(CSV_BACKUP_COUNT - 1, 0, -1):
+            src = f"{_csv_path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{_csv_path}.{i + 1}")
+        os.replace(_csv_path, f"{_csv_path}.1")
+    finally:
+        # リネームに失敗しても閉じたままにせず、開き直して書き込みを続けられるようにする
+        _open_result_csv()
+
+def _close_result_csv() -> None:
+    with _csv_lock:
+        _csv_fh.close()
+
+_open_result_csv()
+atexit.register(_close_result_csv)
+
+def write_result_rows(rows: List[list]) -> None:
+    # イベントループ外（asyncio.to_thread）から呼ばれる
+    global _csv_size
+    with _csv_lock:
+        for row in rows:
+            if _csv_size >= CSV_MAX_BYTES:
+                _rotate_result_csv()
+            _csv_row_buf.seek(0)
+            _csv_row_buf.truncate()
+            _csv_writer.writerow(row)
+            line = _csv_row_buf.getvalue().encode("utf-8")
+            _csv_fh.write(line)
+            _csv_size += len(line)
+        _csv_fh.flush()
 
 # --- Prometheus metrics
-g_up = Gauge('svc_up', '0=down,1=up', ['name', 'type'])
+g_up = Gauge('svc_up', '0=down,1=up', ['name'])
+g_up_by_type = Gauge('svc_up_by_type', 'number of up services per type', ['type'])
 g_response_ms = Gauge('svc_resp_ms', 'response time ms', ['name'])
 
+# --- DNSキャッシュ（check_tcp用）
+DNS_CACHE_TTL = 900
+_addr_cache: Dict[Tuple[str, int], Tuple[float, List[Tuple[int, tuple]]]] = {}  # (host, port) -> (resolved_at, [(family, sockaddr)])
+
 # --- 内部状態：簡易デデュープ（障害重複防止）
 last_state = {}  # name -> {"up": True/False, "since": timestamp}
 
@@ -71,8 +125,9 @@ class Notifier(ABC):
         pass
 
 class DiscordNotifier(Notifier):
-    def __init__(self, webhook_url: Optional[str]):
+    def __init__(self, webhook_url: Optional[str], session: ClientSession):
         self.webhook_url = webhook_url
+        self.session = session
 
     async def notify(self, msg: str) -> None:
         if not self.webhook_url:
@@ -81,26 +136,30 @@ class DiscordNotifier(Notifier):
         url = self.webhook_url
         data = {"content": msg}
         try:
-            requests.post(url, json=data, timeout=10)
+            async with self.session.post(url, json=data, timeout=aiohttp.ClientTimeout(total=10)) as r:
+                await r.read()
             logger.info(f"Sent Discord notification: {msg}")
         except Exception as e:
             logger.error(f"Discord send failed: {e}")
 
-notifiers: List[Notifier] = [DiscordNotifier(DISCORD_WEBHOOK_URL)]
+# main_loopでClientSession生成後に登録する
+notifiers: List[Notifier] = []
 
 async def send_notification(msg: str) -> None:
     for notifier in notifiers:
         await notifier.notify(msg)
 
-async def check_http(session: ClientSession, name: str, url: str, retries: int = 2, backoff: float = 2.0) -> Tuple[bool, Optional[float], Any]:
+async def check_http(session: ClientSession, name: str, url: str, sem: asyncio.Semaphore, retries: int = 2, backoff: float = 2.0) -> Tuple[bool, Optional[float], Any]:
     attempt = 0
     while attempt <= retries:
-        start = time.time()
         try:
-            async with session.get(url, timeout=10) as r:
-                ok = (200 <= r.status < 400)
-                resp_ms = (time.time()-start)*1000
-                return ok, resp_ms, r.status
+            # 枠は通信中だけ確保し、リトライ待ちの間は他のチェックに譲る
+            async with sem:
+                start = time.time()
+                async with session.get(url) as r:
+                    ok = (200 <= r.status < 400)
+                    resp_ms = (time.time()-start)*1000
+                    return ok, resp_ms, r.status
         except Exception as e:
             logger.warning(f"HTTP check failed for {name} ({url}) (attempt {attempt+1}/{retries+1}): {e}")
             if attempt < retries:
@@ -108,37 +167,73 @@ async def check_http(session: ClientSession, name: str, url: str, retries: int =
             attempt += 1
     return False, None, f"HTTP check failed after {retries+1} attempts"
 
-async def check_tcp(host: str, port: int, retries: int = 2, backoff: float = 2.0) -> Tuple[bool, Any]:
+async def resolve_tcp(host: str, port: int) -> List[Tuple[int, tuple]]:
+    key = (host, port)
+    now = time.monotonic()
+    cached = _addr_cache.get(key)
+    if cached and now - cached[0] < DNS_CACHE_TTL:
+        return cached[1]
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    # open_connection(host, port)と同様に全アドレスを順に試せるよう、解決結果をすべて保持する
+    addrs = [(family, sockaddr) for family, _, _, _, sockaddr in infos]
+    _addr_cache[key] = (now, addrs)
+    return addrs
+
+async def connect_any(addrs: List[Tuple[int, tuple]]) -> None:
+    # いずれかのアドレスに接続できれば成功。すべて失敗したら最後のエラーを送出する
+    last_exc: Optional[Exception] = None
+    for family, sockaddr in addrs:
+        try:
+            reader, writer = await asyncio.open_connection(sockaddr[0], sockaddr[1], family=family)
+        except OSError as e:
+            last_exc = e
+            continue
+        writer.close()
+        await writer.wait_closed()
+        return
+    raise last_exc or OSError("no addresses resolved")
+
+async def check_tcp(host: str, port: int, sem: asyncio.Semaphore, retries: int = 2, backoff: float = 2.0) -> Tuple[bool, Any]:
     attempt = 0
     while attempt <= retries:
         try:
-            reader, writer = await asyncio.open_connection(host, port)
-            writer.close()
-            await writer.wait_closed()
+            async with sem:
+                addrs = await resolve_tcp(host, port)
+                await connect_any(addrs)
             return True, 0
         except Exception as e:
+            # 全アドレスに接続できなかった: 解決結果が古い可能性があるので次の試行で引き直す
+            _addr_cache.pop((host, port), None)
             logger.warning(f"TCP check failed for {host}:{port} (attempt {attempt+1}/{retries+1}): {e}")
             if attempt < retries:
                 await asyncio.sleep(backoff * (2 ** attempt))
             attempt += 1
     return False, f"TCP check failed after {retries+1} attempts"
 
-def check_ping(host: str) -> bool:
+async def run_command(*args: str) -> int:
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    return await proc.wait()
+
+async def check_ping(host: str) -> Tuple[bool, Any]:
     try:
         # platform-dependent; Linuxでの例
-        proc = subprocess.run(["ping", "-c", "2", "-W", "2", host], capture_output=True)
-        return proc.returncode == 0
+        rc = await run_command("ping", "-c", "2", "-W", "2", host)
+        return rc == 0, None
     except Exception as e:
         logger.exception(f"Ping check failed for {host}: {e}")
-        return False
+        return False, None
 
-def check_systemd(unit_name: str) -> bool:
+async def check_systemd(unit_name: str) -> Tuple[bool, Any]:
     try:
-        proc = subprocess.run(["systemctl", "is-active", "--quiet", unit_name])
-        return proc.returncode == 0
+        rc = await run_command("systemctl", "is-active", "--quiet", unit_name)
+        return rc == 0, None
     except Exception as e:
         logger.exception(f"systemd check failed for {unit_name}: {e}")
-        return False
+        return False, None
 
 async def attempt_autorecover(entry: dict) -> None:
     t = entry['type']
@@ -147,52 +242,89 @@ async def attempt_autorecover(entry: dict) -> None:
         if t == "systemd":
             svc = entry['target']
             logger.warning(f"Attempting restart of {svc}")
-            subprocess.run(["sudo", "systemctl", "restart", svc])
+            await run_command("sudo", "systemctl", "restart", svc)
             await asyncio.sleep(3)
         elif t == "docker":
             container = entry['target']
             logger.warning(f"Attempting restart of docker container {container}")
-            subprocess.run(["sudo", "docker", "restart", container])
+            await run_command("sudo", "docker", "restart", container)
             await asyncio.sleep(3)
     except Exception as e:
         logger.exception(f"Autorecover failed for {name} ({t}): {e}")
 
 
 class MonitorAgent:
-    def __init__(self, monitored: List[dict]):
+    def __init__(self, monitored: List[dict], max_concurrency: int = 32):
         self.monitored = monitored
         self.last_state: Dict[str, dict] = {}
+        # 同時実行数を制限し、監視対象が多いときの接続・DNSのバーストを抑える（リトライの待ち時間は含まない）
+        self._sem = asyncio.Semaphore(max_concurrency)
+        # フラッピング時に再起動を連発しないよう、サービスごとに最後の自動復旧時刻を記録する
+        self._last_recover_ts: Dict[str, float] = {}
+        # ラベル解決は初回だけ行い、以降は子メトリクスを直接更新する
+        self._g_up = {e['name']: g_up.labels(name=e['name']) for e in monitored}
+        # 応答時間は計測できたときだけ系列を作る（tcp/ping等や未応答のサービスに0msを出さない）
+        self._g_ms: Dict[str, Any] = {}
+        self._g_up_by_type = {e['type']: g_up_by_type.labels(type=e['type']) for e in monitored}
+        # 結果CSVの行はキューに積み、csv_writerタスクがまとめて書き込む
+        self._csv_queue: asyncio.Queue = asyncio.Queue(maxsize=CSV_QUEUE_SIZE)
+
+    def _drain_csv_queue(self) -> List[list]:
+        rows: List[list] = []
+        while not self._csv_queue.empty():
+            rows.append(self._csv_queue.get_nowait())
+        return rows
+
+    async def csv_writer(self) -> None:
+        # 一定間隔でキューをまとめて書き出す。ファイル書き込みはスレッドで行いイベントループを止めない
+        try:
+            while True:
+                await asyncio.sleep(CSV_FLUSH_INTERVAL)
+                rows = self._drain_csv_queue()
+                if not rows:
+                    continue
+                try:
+                    await asyncio.to_thread(write_result_rows, rows)
+                except Exception as e:
+                    # ディスクフル等で失敗してもタスクは止めず、次の周期で書き込みを続ける
+                    logger.exception(f"CSV write error ({len(rows)} rows dropped): {e}")
+        finally:
+            # 停止時に残りを書き出す
+            rows = self._drain_csv_queue()
+            if rows:
+                write_result_rows(rows)
+
+    async def _check(self, session: ClientSession, entry: dict) -> Any:
+        t = entry['type']
+        name = entry['name']
+        if t == "http":
+            return await check_http(session, name, entry['target'], self._sem, retries=2, backoff=2.0)
+        elif t == "tcp":
+            host, port = entry['target']
+            return await check_tcp(host, port, self._sem, retries=2, backoff=2.0)
+        elif t == "ping":
+            async with self._sem:
+                return await check_ping(entry['target'])
+        elif t == "systemd":
+            async with self._sem:
+                return await check_systemd(entry['target'])
+        else:
+            return (False, f"unknown type {t}")
+
+    async def _run_check(self, session: ClientSession, entry: dict) -> Tuple[dict, Any]:
+        try:
+            res = await self._check(session, entry)
+        except Exception as e:
+            res = (False, str(e))
+        return entry, res
 
     async def check_once(self, session: ClientSession) -> None:
-        tasks = []
-        for entry in self.monitored:
-            t = entry['type']
+        tasks = [asyncio.create_task(self._run_check(session, entry)) for entry in self.monitored]
+        # collect: 完了した順に処理し、遅いチェックに他の結果が待たされないようにする
+        up_by_type = dict.fromkeys(self._g_up_by_type, 0)
+        for fut in asyncio.as_completed(tasks):
+            entry, res = await fut
             name = entry['name']
-            if t == "http":
-                tasks.append((name, asyncio.create_task(check_http(session, name, entry['target'], retries=2, backoff=2.0))))
-            elif t == "tcp":
-                host, port = entry['target']
-                tasks.append((name, asyncio.create_task(check_tcp(host, port, retries=2, backoff=2.0))))
-            elif t == "ping":
-                ok = check_ping(entry['target'])
-                fut = asyncio.get_event_loop().create_future()
-                fut.set_result((ok, None))
-                tasks.append((name, fut))
-            elif t == "systemd":
-                ok = check_systemd(entry['target'])
-                fut = asyncio.get_event_loop().create_future()
-                fut.set_result((ok, None))
-                tasks.append((name, fut))
-            else:
-                fut = asyncio.get_event_loop().create_future()
-                fut.set_result((False, f"unknown type {t}"))
-                tasks.append((name, fut))
-        # collect
-        for name, task in tasks:
-            try:
-                res = await task
-            except Exception as e:
-                res = (False, str(e))
             # normalize
             if isinstance(res, tuple) and len(res) == 3:
                 ok, resp_ms, status = res
@@ -205,12 +337,20 @@ class MonitorAgent:
                 resp_ms = None
                 status = str(res)
             # update metrics
-            entry = next((e for e in self.monitored if e['name']==name), None)
-            g_up.labels(name=name, type=entry['type']).set(1 if ok else 0)
+            self._g_up[name].set(1 if ok else 0)
+            if ok:
+                up_by_type[entry['type']] += 1
             if resp_ms:
-                g_response_ms.labels(name=name).set(resp_ms)
+                g_ms = self._g_ms.get(name)
+                if g_ms is None:
+                    g_ms = self._g_ms[name] = g_response_ms.labels(name=name)
+                g_ms.set(resp_ms)
             # record result
-            record_result_csv(name, entry['type'], ok, status, resp_ms)
+            row = [datetime.now().isoformat(), name, entry['type'], ok, status, resp_ms if resp_ms is not None else ""]
+            try:
+                self._csv_queue.put_nowait(row)
+            except asyncio.QueueFull:
+                logger.warning(f"CSV queue full, dropping result for {name}")
             # state change logic
             prev = self.last_state.get(name, {"up": True})
             if ok and not prev.get("up", True):
@@ -225,23 +365,49 @@ class MonitorAgent:
                 msg = f"🚨 DOWN: {name} ({entry['type']}) status={status}"
                 logger.error(msg)
                 await send_notification(msg)
-                await attempt_autorecover(entry)
+                now = time.monotonic()
+                if now - self._last_recover_ts.get(name, float("-inf")) >= AUTORECOVER_COOLDOWN:
+                    self._last_recover_ts[name] = now
+                    await attempt_autorecover(entry)
+                else:
+                    logger.info(f"Skipping autorecover for {name}: attempted within the last {AUTORECOVER_COOLDOWN}s")
             else:
                 # stable state, nothing to do
                 pass
+        for t, count in up_by_type.items():
+            self._g_up_by_type[t].set(count)
 
 async def main_loop():
-    agent = MonitorAgent(MONITORED)
-    async with ClientSession() as session:
-        while True:
-            try:
-                await agent.check_once(session)
-            except KeyboardInterrupt:
-                logger.info("KeyboardInterrupt: graceful shutdown.")
-                break
-            except Exception as e:
-                logger.exception(f"check error: {e}")
-            await asyncio.sleep(CHECK_INTERVAL)
+    agent = MonitorAgent(MONITORED, max_concurrency=MAX_CONCURRENT_CHECKS)
+    try:
+        resolver = AsyncResolver()
+    except RuntimeError:
+        # aiodns未インストール時はgetaddrinfoベースにフォールバック
+        resolver = DefaultResolver()
+    # 監視対象ごとにkeep-aliveで接続を使い回し、毎回のTCP/TLSハンドシェイクを避ける
+    connector = aiohttp.TCPConnector(
+        limit=max(100, 2 * len(MONITORED)),
+        limit_per_host=4,
+        keepalive_timeout=60,
+        resolver=resolver,
+        use_dns_cache=True,
+        ttl_dns_cache=DNS_CACHE_TTL,
+    )
+    async with ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=10)) as session:
+        notifiers.append(DiscordNotifier(DISCORD_WEBHOOK_URL, session))
+        csv_task = asyncio.create_task(agent.csv_writer())
+        try:
+            while True:
+                try:
+                    await agent.check_once(session)
+                except KeyboardInterrupt:
+                    logger.info("KeyboardInterrupt: graceful shutdown.")
+                    break
+                except Exception as e:
+                    logger.exception(f"check error: {e}")
+                await asyncio.sleep(CHECK_INTERVAL)
+        finally:
+            csv_task.cancel()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,36 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("MONITOR_CONFIG_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "config.yaml.example"))
+import monitor
+
+
+async def test_autorecover_skipped_within_cooldown(monkeypatch):
+    results = []
+    recovered = []
+
+    async def fake_check_systemd(unit_name):
+        return results.pop(0), None
+
+    async def fake_autorecover(entry):
+        recovered.append(entry['name'])
+
+    monkeypatch.setattr(monitor, "check_systemd", fake_check_systemd)
+    monkeypatch.setattr(monitor, "attempt_autorecover", fake_autorecover)
+    monkeypatch.setattr(monitor, "AUTORECOVER_COOLDOWN", 300)
+    agent = monitor.MonitorAgent([{"name": "svc", "type": "systemd", "target": "svc.service"}])
+
+    # down -> up -> down: the second outage is within the cooldown
+    results.extend([False, True, False])
+    for _ in range(3):
+        await agent.check_once(None)
+    assert recovered == ["svc"]
+
+    # Once the cooldown has passed the next outage triggers a restart again
+    agent._last_recover_ts["svc"] -= 301
+    results.extend([True, False])
+    for _ in range(2):
+        await agent.check_once(None)
+    assert recovered == ["svc", "svc"]
@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("MONITOR_CONFIG_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "config.yaml.example"))
+import monitor
+
+
+@pytest.fixture
+def result_csv(tmp_path):
+    orig_path = monitor._csv_path
+    monitor._close_result_csv()
+    monitor._csv_path = str(tmp_path / "monitor_results.csv")
+    monitor._open_result_csv()
+    yield tmp_path / "monitor_results.csv"
+    monitor._close_result_csv()
+    monitor._csv_path = orig_path
+    monitor._open_result_csv()
+
+
+def test_rotates_at_max_bytes_with_multibyte_rows(result_csv, monkeypatch):
+    monkeypatch.setattr(monitor, "CSV_MAX_BYTES", 100)
+    monkeypatch.setattr(monitor, "CSV_BACKUP_COUNT", 2)
+    # Each row is 12 characters but 26 bytes in UTF-8
+    row_bytes = len("0,ウェブ,接続失敗\r\n".encode("utf-8"))
+    for i in range(10):
+        monitor.write_result_rows([[i, "ウェブ", "接続失敗"]])
+
+    backup1 = result_csv.with_name(result_csv.name + ".1")
+    backup2 = result_csv.with_name(result_csv.name + ".2")
+    assert backup1.exists() and backup2.exists()
+    assert not result_csv.with_name(result_csv.name + ".3").exists()
+    # A file rotates on the first row written after it reaches CSV_MAX_BYTES
+    for backup in (backup1, backup2):
+        assert 100 <= backup.stat().st_size < 100 + row_bytes
+    assert monitor._csv_size == result_csv.stat().st_size
+
+    def first_index(path):
+        return int(path.read_text(encoding="utf-8").split(",", 1)[0])
+
+    # Older rows are shifted to higher-numbered backups
+    assert first_index(backup2) < first_index(backup1) < first_index(result_csv)
+
+
+def test_size_tracking_resumes_from_existing_file(result_csv):
+    monitor.write_result_rows([[0, "ウェブ", "接続失敗"]])
+    monitor._close_result_csv()
+    monitor._open_result_csv()
+    assert monitor._csv_size == result_csv.stat().st_size
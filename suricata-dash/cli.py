@@ -7,13 +7,17 @@ dashboard in the terminal using Rich.
 """
 import asyncio
 import base64
+import hmac
 import os
 import argparse
-import json
 from collections import Counter, deque
-from typing import Any, Dict, Deque, List, Optional
+from functools import lru_cache
+from itertools import islice
+from typing import Any, BinaryIO, Callable, Dict, Deque, Iterable, Iterator, List, Optional, Tuple
 
 import aiohttp
+import ijson
+import msgspec
 from aiohttp import web
 from dotenv import load_dotenv
 from rich.console import Console
@@ -43,14 +47,34 @@ settings = Settings()
 console = Console()
 
 
+class EveEvent(msgspec.Struct, omit_defaults=True):
+    """The subset of a Suricata EVE record used by the dashboard; other fields are dropped on decode."""
+    event_type: str = "unknown"
+    timestamp: Optional[str] = None
+    src_ip: Optional[str] = None
+    src_ipv6: Optional[str] = None
+    dest_ip: Optional[str] = None
+    dest_ipv6: Optional[str] = None
+    alert: Optional[Dict[str, Any]] = None
+
+
+_event_decoder = msgspec.json.Decoder(EveEvent)
+# Arrays are split into raw elements first so one non-conforming record does not reject the batch
+_array_decoder = msgspec.json.Decoder(List[msgspec.Raw])
+_json_encoder = msgspec.json.Encoder()
+
+
 class DashboardState:
     def __init__(self, maxlen: int = 1000):
-        self.events: Deque[Dict[str, Any]] = deque(maxlen=maxlen)
+        self.events: Deque[EveEvent] = deque(maxlen=maxlen)
         self.total_received: int = 0
         self.event_type_counts: Counter = Counter()
         self.src_ip_counts: Counter = Counter()
         self.dest_ip_counts: Counter = Counter()
         self.alert_counts: Counter = Counter()
+        # Set on ingest and cleared once the dashboard has been rebuilt
+        self.dirty: bool = True
+        self._top_cache: Optional[Tuple[int, Dict[str, List[Tuple[Any, int]]]]] = None
 
     def clear(self):
         """Reset the dashboard state for testing or re-use."""
@@ -60,28 +84,65 @@ class DashboardState:
         self.src_ip_counts = Counter()
         self.dest_ip_counts = Counter()
         self.alert_counts = Counter()
+        self.dirty = True
+        self._top_cache = None
 
-    def ingest(self, event: Dict[str, Any]):
-        self.events.appendleft(event)
+    def ingest(self, event: EveEvent):
         self.total_received += 1
-        e_type = event.get("event_type", "unknown")
-        self.event_type_counts[e_type] += 1
-        src = event.get("src_ip") or event.get("src_ipv6")
-        dst = event.get("dest_ip") or event.get("dest_ipv6")
+        self.dirty = True
+        if not self.events.maxlen:
+            # MAX_EVENTS=0 keeps no events, so the windowed counters stay empty
+            return
+        if len(self.events) == self.events.maxlen:
+            # Evicted events must leave the counters too, otherwise they grow without bound
+            self._count(self.events.pop(), -1)
+        self.events.appendleft(event)
+        self._count(event, 1)
+
+    def top(self) -> Dict[str, List[Tuple[Any, int]]]:
+        """Return the top 10 source IPs, destination IPs and alerts.
+
+        The result is reused until another event is ingested.
+        """
+        if self._top_cache is None or self._top_cache[0] != self.total_received:
+            self._top_cache = (self.total_received, {
+                "src_ips": self.src_ip_counts.most_common(10),
+                "dest_ips": self.dest_ip_counts.most_common(10),
+                "alerts": self.alert_counts.most_common(10),
+            })
+        return self._top_cache[1]
+
+    def _count(self, event: EveEvent, delta: int):
+        self._bump(self.event_type_counts, event.event_type, delta)
+        src = event.src_ip or event.src_ipv6
+        dst = event.dest_ip or event.dest_ipv6
         if src:
-            self.src_ip_counts[src] += 1
+            self._bump(self.src_ip_counts, src, delta)
         if dst:
-            self.dest_ip_counts[dst] += 1
-        alert = event.get("alert")
+            self._bump(self.dest_ip_counts, dst, delta)
+        alert = event.alert
         if alert:
             sig = alert.get("signature") or str(alert.get("gid"))
             if sig:
-                self.alert_counts[sig] += 1
+                self._bump(self.alert_counts, sig, delta)
+
+    @staticmethod
+    def _bump(counter: Counter, key: Any, delta: int):
+        count = counter[key] + delta
+        if count > 0:
+            counter[key] = count
+        else:
+            del counter[key]
 
 
 dashboard_state = DashboardState(maxlen=settings.max_events)
 
 
+@lru_cache(maxsize=1)
+def _basic_auth_header(username: str, password: str) -> bytes:
+    return b"Basic " + base64.b64encode(f"{username}:{password}".encode())
+
+
 def verify_auth(request: web.Request) -> bool:
     if settings.auth_type == "none":
         return True
@@ -90,39 +151,58 @@ def verify_auth(request: web.Request) -> bool:
         if not header.startswith("Bearer "):
             return False
         token = header.split(" ", 1)[1]
-        return token == settings.auth_bearer_token
+        return hmac.compare_digest(token.encode(), settings.auth_bearer_token.encode())
     if settings.auth_type == "basic":
-        header = request.headers.get("Authorization", "")
-        if not header.startswith("Basic "):
-            return False
-        token_b64 = header.split(" ", 1)[1]
-        try:
-            token = base64.b64decode(token_b64.encode()).decode()
-        except Exception:
-            return False
-        try:
-            user, pwd = token.split(":", 1)
-            return user == settings.auth_username and pwd == settings.auth_password
-        except Exception:
-            return False
+        # Compare the raw header against the pre-encoded credentials instead of decoding it per request
+        header = request.headers.get("Authorization", "").encode("utf-8", "surrogatepass")
+        expected = _basic_auth_header(settings.auth_username, settings.auth_password)
+        return hmac.compare_digest(header, expected)
     return False
 
 
+async def _ingest_ndjson(request: web.Request) -> web.Response:
+    """Ingest a newline-delimited JSON body one line at a time as it streams in."""
+    try:
+        async for line in request.content:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                dashboard_state.ingest(_event_decoder.decode(line))
+            except msgspec.DecodeError:
+                # Ignore invalid lines
+                continue
+    except ValueError:
+        # Raised by the stream reader when a line exceeds its buffer limit
+        return web.Response(status=400, text="Line too long")
+    return web.Response(status=200, text="OK")
+
+
 async def ingest_handler(request: web.Request) -> web.Response:
     # Authentication
     if not verify_auth(request):
         return web.Response(status=401, text="Unauthorized")
+    if request.content_type == "application/x-ndjson":
+        return await _ingest_ndjson(request)
+    body = await request.read()
     try:
-        payload = await request.json()
-    except Exception:
+        try:
+            raw_events = _array_decoder.decode(body)
+        except msgspec.ValidationError:
+            # Not an array: decode it as a single event
+            events = [_event_decoder.decode(body)]
+        else:
+            events = []
+            for raw in raw_events:
+                try:
+                    events.append(_event_decoder.decode(raw))
+                except msgspec.ValidationError:
+                    # Skip invalid records, as the NDJSON path does
+                    continue
+    except msgspec.ValidationError:
+        return web.Response(status=400, text="JSON must be object or array of events")
+    except msgspec.DecodeError:
         return web.Response(status=400, text="Invalid JSON")
-    events: List[Dict[str, Any]] = []
-    if isinstance(payload, list):
-        events = payload
-    elif isinstance(payload, dict):
-        events = [payload]
-    else:
-        return web.Response(status=400, text="JSON must be object or array")
     for ev in events:
         dashboard_state.ingest(ev)
     return web.Response(status=200, text="OK")
@@ -133,17 +213,19 @@ async def health_handler(request: web.Request) -> web.Response:
 
 
 async def stats_handler(request: web.Request) -> web.Response:
+    top = dashboard_state.top()
     data = {
         "total_received": dashboard_state.total_received,
         "event_type_counts": dict(dashboard_state.event_type_counts),
-        "top_src_ips": dashboard_state.src_ip_counts.most_common(10),
-        "top_dest_ips": dashboard_state.dest_ip_counts.most_common(10),
-        "top_alerts": dashboard_state.alert_counts.most_common(10),
+        "top_src_ips": top["src_ips"],
+        "top_dest_ips": top["dest_ips"],
+        "top_alerts": top["alerts"],
     }
-    return web.json_response(data)
+    return web.Response(body=_json_encoder.encode(data), content_type="application/json")
 
 
 def build_dashboard() -> Layout:
+    top = dashboard_state.top()
     layout = Layout()
     layout.split_column(
         Layout(name="header", size=3),
@@ -171,7 +253,7 @@ def build_dashboard() -> Layout:
     src_table = Table(title="Top Source IPs", show_header=True, header_style="bold magenta")
     src_table.add_column("IP")
     src_table.add_column("Count", justify="right")
-    for ip, cnt in dashboard_state.src_ip_counts.most_common(10):
+    for ip, cnt in top["src_ips"]:
         src_table.add_row(ip, str(cnt))
     left_layout["top_src"].update(src_table)
     layout["left"].update(left_layout)
@@ -183,7 +265,7 @@ def build_dashboard() -> Layout:
     alert_table = Table(title="Top Alerts", show_header=True, header_style="bold yellow")
     alert_table.add_column("Signature")
     alert_table.add_column("Count", justify="right")
-    for sig, cnt in dashboard_state.alert_counts.most_common(10):
+    for sig, cnt in top["alerts"]:
         alert_table.add_row(str(sig), str(cnt))
     right_layout["alerts"].update(alert_table)
 
@@ -194,18 +276,19 @@ def build_dashboard() -> Layout:
     recent_table.add_column("Dst")
     recent_table.add_column("Info")
     # Recent events: use up to 10
-    for ev in list(dashboard_state.events)[:10]:
-        ts = ev.get("timestamp") or "-"
-        et = ev.get("event_type", "-")
-        src = ev.get("src_ip") or ev.get("src_ipv6") or "-"
-        dst = ev.get("dest_ip") or ev.get("dest_ipv6") or "-"
+    for ev in islice(dashboard_state.events, 10):
+        ts = ev.timestamp or "-"
+        et = ev.event_type
+        src = ev.src_ip or ev.src_ipv6 or "-"
+        dst = ev.dest_ip or ev.dest_ipv6 or "-"
         info = ""
-        if ev.get("alert"):
-            info = ev["alert"].get("signature", ev["alert"].get("gid", ""))
+        if ev.alert:
+            info = ev.alert.get("signature", ev.alert.get("gid", ""))
         recent_table.add_row(ts, et, src, dst, str(info))
     right_layout["recent"].update(recent_table)
     layout["right"].update(right_layout)
 
+    dashboard_state.dirty = False
     return layout
 
 
@@ -226,7 +309,9 @@ async def dashboard_loop():
 
     with Live(build_dashboard(), refresh_per_second=1, screen=True) as live:
         while True:
-            live.update(build_dashboard())
+            # Only rebuild the layout when new events have arrived
+            if dashboard_state.dirty:
+                live.update(build_dashboard())
             await asyncio.sleep(settings.refresh)
 
 
@@ -238,47 +323,75 @@ async def dashboard_local_loop():
     with Live(build_dashboard(), refresh_per_second=1, screen=True) as live:
         try:
             while True:
-                live.update(build_dashboard())
+                if dashboard_state.dirty:
+                    live.update(build_dashboard())
                 await asyncio.sleep(settings.refresh)
         except KeyboardInterrupt:
             return
 
 
+def _iter_jsonl(fh: Iterable[bytes]) -> Iterator[EveEvent]:
+    for line in fh:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield _event_decoder.decode(line)
+        except msgspec.DecodeError:
+            # Ignore invalid lines
+            continue
+
+
+def _iter_items(fh: BinaryIO, prefix: str, multiple_values: bool = False, fallback: Optional[Callable[[BinaryIO], Iterator[EveEvent]]] = None) -> Iterator[EveEvent]:
+    parsed_any = False
+    try:
+        for item in ijson.items(fh, prefix, use_float=True, multiple_values=multiple_values):
+            parsed_any = True
+            try:
+                yield msgspec.convert(item, EveEvent)
+            except msgspec.ValidationError:
+                # Ignore invalid items
+                continue
+    except ijson.JSONError as e:
+        if not parsed_any and fallback is not None:
+            # Nothing parsed in this format (e.g. jsonlines starting with a truncated record): retry as fallback
+            fh.seek(0)
+            yield from fallback(fh)
+            return
+        # Truncated or malformed input (e.g. a file still being written): keep what was read so far
+        console.log(f"Stopped reading events at invalid JSON: {e}")
+
+
 def ingest_events_from_file(path: str) -> int:
     """Read a local eve.json file and ingest events into dashboard_state.
 
     Returns the number of events ingested.
-    Supports both a JSON array or newline-delimited JSON (jsonlines).
+    Supports a JSON array, a single (possibly pretty-printed) JSON object, or
+    newline-delimited JSON (jsonlines).
+    The file is parsed incrementally, so memory does not grow with file size.
     """
     if not os.path.exists(path):
         raise FileNotFoundError(f"Events file not found: {path}")
     ingested = 0
-    with open(path, "r", encoding="utf-8") as fh:
-        content = fh.read()
-    # Try to parse as a JSON array
-    try:
-        data = json.loads(content)
-        if isinstance(data, dict):
-            events = [data]
-        elif isinstance(data, list):
-            events = data
+    with open(path, "rb", buffering=1024 * 1024) as fh:
+        # Decide the format from the first non-whitespace byte without consuming it
+        head = fh.peek(1).lstrip()[:1]
+        if head == b"[":
+            events = _iter_items(fh, "item")
         else:
-            events = []
-    except Exception:
-        # Fallback: JSON Lines
-        events = []
-        for line in content.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                events.append(json.loads(line))
-            except Exception:
-                # Ignore invalid lines
-                continue
-    for ev in events:
-        dashboard_state.ingest(ev)
-        ingested += 1
+            events = _iter_jsonl(fh)
+            if head == b"{":
+                first = fh.readline()
+                fh.seek(0)
+                try:
+                    msgspec.json.decode(first)
+                except msgspec.DecodeError:
+                    # The first line is not a whole document: either the object spans several
+                    # lines, or it is jsonlines whose first record is broken
+                    events = _iter_items(fh, "", multiple_values=True, fallback=_iter_jsonl)
+        for ev in events:
+            dashboard_state.ingest(ev)
+            ingested += 1
     return ingested
 
 
@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from cli import DashboardState, EveEvent
+
+
+def test_eviction_decrements_counters():
+    state = DashboardState(maxlen=2)
+    state.ingest(EveEvent(event_type="alert", src_ip="10.0.0.1", alert={"signature": "old sig"}))
+    state.ingest(EveEvent(event_type="flow", src_ip="10.0.0.2"))
+    state.ingest(EveEvent(event_type="flow", src_ip="10.0.0.2"))
+    assert state.total_received == 3
+    assert len(state.events) == 2
+    assert "alert" not in state.event_type_counts
+    assert "10.0.0.1" not in state.src_ip_counts
+    assert "old sig" not in state.alert_counts
+    assert state.event_type_counts["flow"] == 2
+    assert state.src_ip_counts["10.0.0.2"] == 2
+
+
+def test_zero_maxlen_keeps_no_events():
+    state = DashboardState(maxlen=0)
+    state.ingest(EveEvent(event_type="alert", src_ip="10.0.0.1"))
+    state.ingest(EveEvent(event_type="alert", src_ip="10.0.0.1"))
+    assert state.total_received == 2
+    assert len(state.events) == 0
+    assert not state.event_type_counts
+    assert state.top()["src_ips"] == []
+
+
+def test_top_is_cached_until_next_ingest():
+    state = DashboardState(maxlen=10)
+    state.ingest(EveEvent(event_type="alert", src_ip="10.0.0.1"))
+    first = state.top()
+    assert state.top() is first
+    assert first["src_ips"] == [("10.0.0.1", 1)]
+    state.ingest(EveEvent(event_type="alert", src_ip="10.0.0.1"))
+    assert state.top()["src_ips"] == [("10.0.0.1", 2)]
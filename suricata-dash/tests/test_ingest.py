@@ -51,5 +51,58 @@ async def test_ingest_post():
     await runner.cleanup()
 
 
+async def test_ingest_ndjson_post():
+    dashboard_state.clear()
+    port = find_free_port()
+    settings.port = port
+    settings.auth_type = "none"
+    app = web.Application()
+    app.router.add_post("/ingest", ingest_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', port)
+    await site.start()
+
+    async with aiohttp.ClientSession() as session:
+        body = b'{"event_type": "alert", "src_ip": "10.0.0.1"}\n\nnot json\n{"event_type": "flow"}\n'
+        headers = {"Content-Type": "application/x-ndjson"}
+        async with session.post(f"http://127.0.0.1:{port}/ingest", data=body, headers=headers) as resp:
+            assert resp.status == 200
+
+    await asyncio.sleep(0.1)
+    assert dashboard_state.total_received == 2
+    assert dashboard_state.event_type_counts.get("flow", 0) == 1
+
+    await runner.cleanup()
+
+
+async def test_ingest_array_skips_invalid_records():
+    dashboard_state.clear()
+    port = find_free_port()
+    settings.port = port
+    settings.auth_type = "none"
+    app = web.Application()
+    app.router.add_post("/ingest", ingest_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', port)
+    await site.start()
+
+    async with aiohttp.ClientSession() as session:
+        payload = [{"event_type": "alert"}, {"event_type": None}, {"event_type": "flow", "alert": "x"}, {"event_type": "flow"}]
+        async with session.post(f"http://127.0.0.1:{port}/ingest", json=payload) as resp:
+            assert resp.status == 200
+        async with session.post(f"http://127.0.0.1:{port}/ingest", json=5) as resp:
+            assert resp.status == 400
+
+    await asyncio.sleep(0.1)
+    assert dashboard_state.total_received == 2
+    assert dashboard_state.event_type_counts.get("flow", 0) == 1
+
+    await runner.cleanup()
+
+
 if __name__ == "__main__":
     asyncio.run(test_ingest_post())
+    asyncio.run(test_ingest_ndjson_post())
+    asyncio.run(test_ingest_array_skips_invalid_records())
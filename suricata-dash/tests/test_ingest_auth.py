@@ -47,6 +47,30 @@ async def test_ingest_basic_auth():
     await runner.cleanup()
 
 
+async def test_ingest_basic_auth_rejects_wrong_password():
+    port = find_free_port()
+    settings.port = port
+    settings.auth_type = "basic"
+    settings.auth_username = "user"
+    settings.auth_password = "pass"
+
+    app = web.Application()
+    app.router.add_post("/ingest", ingest_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', port)
+    await site.start()
+
+    async with aiohttp.ClientSession() as session:
+        payload = [{"timestamp": "2025-01-01T00:00:00Z", "event_type": "alert"}]
+        token = base64.b64encode(b"user:wrong").decode()
+        headers = {"Authorization": f"Basic {token}"}
+        async with session.post(f"http://127.0.0.1:{port}/ingest", json=payload, headers=headers) as resp:
+            assert resp.status == 401
+
+    await runner.cleanup()
+
+
 async def test_ingest_bearer_auth():
     port = find_free_port()
     settings.port = port
@@ -74,4 +98,5 @@ async def test_ingest_bearer_auth():
 
 if __name__ == "__main__":
     asyncio.run(test_ingest_basic_auth())
+    asyncio.run(test_ingest_basic_auth_rejects_wrong_password())
     asyncio.run(test_ingest_bearer_auth())
@@ -32,3 +32,37 @@ def test_ingest_jsonlines(tmp_path):
     ingested = ingest_events_from_file(str(p))
     assert ingested == 2
     assert dashboard_state.event_type_counts.get("alert", 0) >= 2
+
+
+def test_ingest_truncated_json_array(tmp_path):
+    dashboard_state.clear()
+    p = tmp_path / "eve.json"
+    # A file still being written: the array and its last object are not closed yet
+    p.write_text('[{"event_type": "alert", "src_ip": "10.0.0.1"}, {"event_type": "flow", "src_')
+    ingested = ingest_events_from_file(str(p))
+    assert ingested == 1
+    assert dashboard_state.event_type_counts.get("alert", 0) == 1
+
+
+def test_ingest_pretty_printed_object(tmp_path):
+    dashboard_state.clear()
+    event = {"timestamp": "2025-01-01T00:00:00Z", "event_type": "alert", "src_ip": "10.0.0.1"}
+    p = tmp_path / "eve.json"
+    p.write_text(json.dumps(event, indent=2))
+    ingested = ingest_events_from_file(str(p))
+    assert ingested == 1
+    assert dashboard_state.event_type_counts.get("alert", 0) == 1
+
+
+def test_ingest_jsonlines_with_truncated_first_line(tmp_path):
+    dashboard_state.clear()
+    lines = [
+        '{"timestamp": "2025-01-01T00:00:00Z", "event_type": "al',
+        json.dumps({"event_type": "alert", "src_ip": "10.0.0.1"}),
+        json.dumps({"event_type": "alert", "src_ip": "10.0.0.2"}),
+    ]
+    p = tmp_path / "eve.json"
+    p.write_text("\n".join(lines))
+    ingested = ingest_events_from_file(str(p))
+    assert ingested == 2
+    assert dashboard_state.event_type_counts.get("alert", 0) == 2
@@ -1,16 +1,45 @@
 import asyncio
-import json
+import gzip
 import os
+import sys
+import threading
 import time
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from contextlib import closing
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Set, Tuple
 
 import aiofiles
 import aiohttp
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+try:
+    import orjson
+
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+    DefaultResponse = ORJSONResponse
+except ImportError:
+    # Fallback for platforms without orjson wheels
+    import json
+
+    json_loads = json.loads
+    DefaultResponse = JSONResponse
+
+    def json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    from watchfiles import watch
+except ImportError:
+    # Without watchfiles the tail loop falls back to polling every READ_INTERVAL
+    watch = None
 
 
 load_dotenv()
@@ -27,21 +56,31 @@ class Settings:
     batch_size: int = int(os.getenv("BATCH_SIZE", "50"))
     batch_interval: float = float(os.getenv("BATCH_INTERVAL", "2.0"))
     read_interval: float = float(os.getenv("READ_INTERVAL", "0.1"))
+    compression: str = os.getenv("HTTP_COMPRESSION", "none").lower()  # none/gzip/zstd
+    max_inflight: int = int(os.getenv("MAX_INFLIGHT", "4"))
+    max_buffer: int = int(os.getenv("MAX_BUFFER", "10000"))
+    event_type_filter: str = os.getenv("EVENT_TYPE_FILTER", "")  # comma-separated, empty = all
     log_level: str = os.getenv("LOG_LEVEL", "info")
 
 
 settings = Settings()
 
 
-class Stats(BaseModel):
+@dataclass(slots=True)
+class Stats:
     total_forwarded: int = 0
     last_forwarded_at: Optional[float] = None
     buffered: int = 0
+    dropped: int = 0
     last_error: Optional[str] = None
 
 
-app = FastAPI(title="Suricata EVE Forwarder")
+app = FastAPI(title="Suricata EVE Forwarder", default_response_class=DefaultResponse)
 stats = Stats()
+# Shared across all flushes so connections are kept alive; created on startup
+http_session: Optional[aiohttp.ClientSession] = None
+background_tasks: List[asyncio.Task] = []
+event_queue: Optional[asyncio.Queue] = None
 
 
 def get_auth_headers() -> Dict[str, str]:
@@ -53,139 +92,363 @@ def get_auth_headers() -> Dict[str, str]:
     return {}
 
 
+# Headers and auth never change for the process lifetime, so build them once
+HEADERS: Dict[str, str] = {"Content-Type": "application/json", **get_auth_headers()}
+BASIC_AUTH: Optional[aiohttp.BasicAuth] = (
+    aiohttp.BasicAuth(settings.auth_username, settings.auth_password) if settings.auth_type == "basic" else None
+)
+
+# Bodies smaller than this are sent uncompressed; the framing overhead outweighs the saving
+COMPRESS_MIN_BYTES = 1024
+
+
+def get_compressor() -> Tuple[Optional[str], Optional[Callable[[bytes], bytes]]]:
+    """Return the Content-Encoding and compress function selected by HTTP_COMPRESSION."""
+    if settings.compression == "zstd" and zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=1).compress
+    if settings.compression in ("zstd", "gzip"):
+        # zstd falls back to gzip when the zstandard package is not installed
+        return "gzip", lambda body: gzip.compress(body, 1)
+    return None, None
+
+
+CONTENT_ENCODING, compress = get_compressor()
+COMPRESSED_HEADERS: Dict[str, str] = {**HEADERS, "Content-Encoding": CONTENT_ENCODING} if CONTENT_ENCODING else HEADERS
+
+
+def _encode_plain(batch: List[Dict[str, Any]]) -> Tuple[bytes, Dict[str, str]]:
+    return json_dumps(batch), HEADERS
+
+
+def _encode_compressed(batch: List[Dict[str, Any]]) -> Tuple[bytes, Dict[str, str]]:
+    body = json_dumps(batch)
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, HEADERS
+    return compress(body), COMPRESSED_HEADERS
+
+
+# Chosen once so send_batch does not re-check the compression setting per batch
+encode_body: Callable[[List[Dict[str, Any]]], Tuple[bytes, Dict[str, str]]] = (
+    _encode_compressed if compress is not None else _encode_plain
+)
+
+
+# Bodies above this are streamed in slices: a single large write makes aiohttp warn,
+# and the transport copies whatever part of it cannot be sent immediately
+STREAM_MIN_BYTES = 1 << 20
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+async def _body_chunks(body: bytes) -> AsyncIterator[memoryview]:
+    view = memoryview(body)
+    for start in range(0, len(view), STREAM_CHUNK_SIZE):
+        yield view[start:start + STREAM_CHUNK_SIZE]
+
+
 async def send_batch(session: aiohttp.ClientSession, batch: List[Dict[str, Any]]):
     if not settings.target_url:
         stats.last_error = "TARGET_URL not configured"
         return
-    headers = {"Content-Type": "application/json"}
-    headers.update(get_auth_headers())
+    body, headers = encode_body(batch)
+    data: Any = body
+    if len(body) > STREAM_MIN_BYTES:
+        # Slices share the encoded bytes; Content-Length keeps the request unchunked
+        data = _body_chunks(body)
+        headers = {**headers, "Content-Length": str(len(body))}
     try:
-        if settings.auth_type == "basic":
-            auth = aiohttp.BasicAuth(settings.auth_username, settings.auth_password)
-            async with session.post(settings.target_url, json=batch, headers=headers, auth=auth) as resp:
-                if resp.status >= 400:
-                    text = await resp.text()
-                    stats.last_error = f"HTTP {resp.status}: {text}"
-                else:
-                    stats.total_forwarded += len(batch)
-                    stats.last_forwarded_at = time.time()
-        else:
-            async with session.post(settings.target_url, json=batch, headers=headers) as resp:
-                if resp.status >= 400:
-                    text = await resp.text()
-                    stats.last_error = f"HTTP {resp.status}: {text}"
-                else:
-                    stats.total_forwarded += len(batch)
-                    stats.last_forwarded_at = time.time()
+        async with session.post(settings.target_url, data=data, headers=headers, auth=BASIC_AUTH) as resp:
+            if resp.status >= 400:
+                text = await resp.text()
+                stats.last_error = f"HTTP {resp.status}: {text}"
+            else:
+                stats.total_forwarded += len(batch)
+                stats.last_forwarded_at = time.time()
     except Exception as e:
         stats.last_error = str(e)
 
 
-async def tail_eve_file():
-    buffer: List[Dict[str, Any]] = []
-    last_send_time = time.time()
+EVENT_TYPES = frozenset(t.strip() for t in settings.event_type_filter.split(",") if t.strip())
+# Suricata writes compact JSON; the spaced form covers json.dumps-style producers
+EVENT_TYPE_NEEDLES = tuple(
+    f'"event_type"{sep}"{t}"'.encode() for t in EVENT_TYPES for sep in (":", ": ")
+)
+
+
+def wanted_line(line: bytes) -> bool:
+    """Cheap substring check run before JSON parsing to skip filtered-out event types."""
+    return not EVENT_TYPE_NEEDLES or any(needle in line for needle in EVENT_TYPE_NEEDLES)
+
+
+def wanted_event(obj: Any) -> bool:
+    """Exact check after parsing, since a needle may also match inside another field."""
+    return not EVENT_TYPES or (isinstance(obj, dict) and obj.get("event_type") in EVENT_TYPES)
+
+
+# Bytes read per wakeup; lines are split locally instead of one readline() per event
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def idle_waits(file_path: str, stop: threading.Event) -> Iterator[None]:
+    """Yield each time the tailed file may have new data; stops once ``stop`` is set.
+
+    With watchfiles this waits for a filesystem notification on the file, and also
+    yields after batch_interval without changes so rotation checks still run.
+    Otherwise it just sleeps read_interval between polls.
+    """
+    if watch is None:
+        while not stop.wait(settings.read_interval):
+            yield
+        return
+    target = os.path.abspath(file_path)
+    # Watch the directory so a replaced (rotated) file at the same path is still seen
+    for _ in watch(
+        os.path.dirname(target),
+        watch_filter=lambda _change, path: path == target,
+        debounce=50,
+        step=10,
+        rust_timeout=int(settings.batch_interval * 1000),
+        yield_on_timeout=True,
+        stop_event=stop,
+    ):
+        yield
+
+
+def _enqueue(queue: asyncio.Queue, events: List[Dict[str, Any]]):
+    # Must run on the event loop thread
+    for obj in events:
+        if queue.full():
+            # Drop the oldest event so a slow or unreachable receiver cannot grow memory
+            queue.get_nowait()
+            stats.dropped += 1
+        queue.put_nowait(obj)
+
+
+def _put_events(loop: asyncio.AbstractEventLoop, queue: asyncio.Queue, events: List[Dict[str, Any]], stop: threading.Event):
+    """Hand one chunk's events to the event loop and wait until they are queued.
+
+    Waiting keeps the reader at most one chunk ahead of the loop, so a stalled loop
+    cannot pile up callbacks beyond the MAX_BUFFER-bounded queue.
+    """
+    handed_over = threading.Event()
+
+    def handoff():
+        _enqueue(queue, events)
+        handed_over.set()
+
+    loop.call_soon_threadsafe(handoff)
+    # Poll the stop event so shutdown is not held up if the loop stops before running handoff
+    while not handed_over.wait(0.5):
+        if stop.is_set():
+            return
+
+
+def _tail_worker(loop: asyncio.AbstractEventLoop, queue: asyncio.Queue, stop: threading.Event):
     file_path = settings.eve_file_path
+    # Only the first open starts at the end; a rotated-in file is read from the beginning
+    from_end = True
+    # (inode, offset) of the last complete line read, so a reopen after an error resumes there
+    resume_at: Optional[Tuple[int, int]] = None
     # Ensure file exists before trying to open it repeatedly
-    while True:
+    while not stop.is_set():
         try:
-            async with aiofiles.open(file_path, mode="r", encoding="utf-8") as f:
-                # Seek to end (start tailing) to only process new lines
-                await f.seek(0, 2)
-                while True:
-                    line = await f.readline()
-                    if not line:
+            # Unbuffered: each read() is a single syscall returning whatever has been appended
+            with open(file_path, "rb", buffering=0) as f, closing(idle_waits(file_path, stop)) as waits:
+                st = os.fstat(f.fileno())
+                opened_ino = st.st_ino
+                if from_end:
+                    # Seek to end (start tailing) to only process new lines
+                    offset = f.seek(0, 2)
+                elif resume_at is not None and resume_at[0] == opened_ino and resume_at[1] <= st.st_size:
+                    # Same file as before the error: continue where reading stopped
+                    offset = f.seek(resume_at[1])
+                else:
+                    offset = 0
+                from_end = False
+                # Recorded right away, so an error before the first new line does not reread the file
+                resume_at = (opened_ino, offset)
+                last_stat = time.monotonic()
+                # Partial last line of the previous chunk, completed by the next read
+                leftover = b""
+                while not stop.is_set():
+                    chunk = f.read(READ_CHUNK_SIZE)
+                    if not chunk:
                         # no new data
-                        # if buffer is due to send because of interval
-                        now = time.time()
-                        if buffer and (len(buffer) >= settings.batch_size or (now - last_send_time) >= settings.batch_interval):
-                            async with aiohttp.ClientSession() as session:
-                                await send_batch(session, buffer.copy())
-                            buffer.clear()
-                            last_send_time = time.time()
-                        await asyncio.sleep(settings.read_interval)
-                        # handle file rotation (if file truncated)
+                        next(waits, None)
+                        # handle file rotation: check at most once per batch_interval
+                        now = time.monotonic()
+                        if now - last_stat < settings.batch_interval:
+                            continue
+                        last_stat = now
                         try:
-                            st = await aiofiles.os.stat(file_path)
-                            if st.st_size < await f.tell():
-                                # file was rotated/truncated
-                                break
-                        except Exception:
+                            st = os.stat(file_path)
+                        except OSError:
                             # if stat fails, break to reopen
                             break
+                        if st.st_size < offset or st.st_ino != opened_ino:
+                            # file was truncated, or replaced by a new file at the same path
+                            resume_at = None
+                            break
                         continue
-                    # Parse JSON line
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        obj = json.loads(line)
-                        buffer.append(obj)
-                        stats.buffered = len(buffer)
-                    except json.JSONDecodeError as e:
-                        stats.last_error = f"JSON parse error: {e}"
-                        # skip invalid JSON lines
-                        continue
-                    # If batch limit reached, send
-                    if len(buffer) >= settings.batch_size:
-                        async with aiohttp.ClientSession() as session:
-                            await send_batch(session, buffer.copy())
-                        buffer.clear()
-                        last_send_time = time.time()
-                        stats.buffered = 0
+                    offset += len(chunk)
+                    # bytes.split finds newlines with a C memchr scan; the parser needs one object
+                    # per line anyway, so an offset-array kernel would not save allocations
+                    lines = (leftover + chunk).split(b"\n")
+                    leftover = lines.pop()
+                    # Recorded before parsing, so a chunk that fails is skipped rather than retried
+                    resume_at = (opened_ino, offset - len(leftover))
+                    events: List[Dict[str, Any]] = []
+                    for line in lines:
+                        # Parse JSON line (raw UTF-8 bytes go straight to the parser)
+                        line = line.strip()
+                        if not line or not wanted_line(line):
+                            continue
+                        try:
+                            obj = json_loads(line)
+                        except ValueError as e:
+                            # Covers orjson/json decode errors and invalid UTF-8 (UnicodeDecodeError)
+                            stats.last_error = f"JSON parse error: {e}"
+                            # skip invalid JSON lines
+                            continue
+                        if wanted_event(obj):
+                            events.append(obj)
+                    if events:
+                        _put_events(loop, queue, events, stop)
         except FileNotFoundError:
-            # Wait for file to exist
-            await asyncio.sleep(1.0)
-            continue
+            # Wait for file to exist; everything in it will be new once it appears
+            from_end = False
+            resume_at = None
+            stop.wait(1.0)
         except Exception as e:
             stats.last_error = str(e)
-            await asyncio.sleep(1.0)
-            continue
+            stop.wait(1.0)
+
+
+async def tail_eve_file(queue: asyncio.Queue):
+    """Producer: tail eve.json on a dedicated thread and put each parsed event on the queue.
+
+    Reading in one long-lived thread avoids an executor round trip per read call.
+    """
+    stop = threading.Event()
+    try:
+        await asyncio.to_thread(_tail_worker, asyncio.get_running_loop(), queue, stop)
+    finally:
+        stop.set()
+
+
+async def forward_events(queue: asyncio.Queue):
+    """Consumer: send queued events once batch_size is reached or batch_interval has passed.
+
+    Up to max_inflight batches are posted concurrently; beyond that the consumer
+    waits for a send to finish before building the next batch.
+    """
+    inflight = asyncio.Semaphore(settings.max_inflight)
+    pending: Set[asyncio.Task] = set()
+
+    def on_sent(task: asyncio.Task):
+        pending.discard(task)
+        inflight.release()
+
+    try:
+        while True:
+            batch = [await queue.get()]
+            try:
+                async with asyncio.timeout(settings.batch_interval):
+                    while len(batch) < settings.batch_size:
+                        batch.append(await queue.get())
+            except TimeoutError:
+                pass
+            await inflight.acquire()
+            task = asyncio.create_task(send_batch(http_session, batch))
+            pending.add(task)
+            task.add_done_callback(on_sent)
+    finally:
+        # Let batches already being sent finish
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+def create_http_session() -> aiohttp.ClientSession:
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=60),
+        timeout=aiohttp.ClientTimeout(total=30),
+    )
 
 
 @app.on_event("startup")
 async def startup_event():
-    # Start background tailing task
-    asyncio.create_task(tail_eve_file())
+    global http_session, event_queue
+    http_session = create_http_session()
+    # Tailing and forwarding run as separate tasks, so file reads continue while a POST is in flight
+    event_queue = asyncio.Queue(maxsize=settings.max_buffer)
+    background_tasks.append(asyncio.create_task(tail_eve_file(event_queue)))
+    background_tasks.append(asyncio.create_task(forward_events(event_queue)))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    if http_session is not None:
+        await http_session.close()
 
 
 @app.get("/health")
 async def health():
-    return JSONResponse({"status": "ok"})
+    return {"status": "ok"}
 
 
 @app.get("/stats")
 async def get_stats():
-    return JSONResponse(stats.dict())
+    # buffered is sampled here rather than kept up to date on every enqueue/dequeue
+    stats.buffered = event_queue.qsize() if event_queue is not None else 0
+    # Returning a Response directly skips FastAPI's jsonable_encoder pass
+    return DefaultResponse(asdict(stats))
+
+
+# Bytes read from the end of eve.json by /send_now
+SEND_NOW_WINDOW = 256 * 1024
 
 
 @app.post("/send_now")
 async def send_now():
-    # Manual trigger: read a chunk of the file and send it
-    # This is a helper; it will just read the file from start and send latest lines - not efficient but ok for demo
+    # Manual trigger: send the latest events (up to batch_size) from the end of the file
     if not settings.target_url:
         raise HTTPException(status_code=400, detail="TARGET_URL is not configured")
     events: List[Dict[str, Any]] = []
     try:
-        async with aiofiles.open(settings.eve_file_path, mode="r", encoding="utf-8") as f:
-            async for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    obj = json.loads(line)
-                except Exception:
-                    continue
-                events.append(obj)
-                if len(events) >= settings.batch_size:
-                    break
-        async with aiohttp.ClientSession() as session:
-            await send_batch(session, events)
+        async with aiofiles.open(settings.eve_file_path, mode="rb") as f:
+            # Only read the tail window so the cost does not grow with the file size
+            size = await f.seek(0, 2)
+            start = max(0, size - SEND_NOW_WINDOW)
+            await f.seek(start)
+            lines = (await f.read()).split(b"\n")
+        if start > 0:
+            # The first line is probably cut off by the seek
+            lines = lines[1:]
+        for line in reversed(lines):
+            line = line.strip()
+            if not line or not wanted_line(line):
+                continue
+            try:
+                obj = json_loads(line)
+            except Exception:
+                continue
+            if not wanted_event(obj):
+                continue
+            events.append(obj)
+            if len(events) >= settings.batch_size:
+                break
+        events.reverse()
+        await send_batch(http_session, events)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"File not found: {settings.eve_file_path}")
-    return JSONResponse({"sent": len(events)})
+    return {"sent": len(events)}
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run("app:app", host="0.0.0.0", port=int(os.getenv("PORT", 8000)), log_level=settings.log_level)
+    # uvloop has no Windows build; use the stock asyncio loop there
+    loop = "asyncio" if sys.platform == "win32" else "uvloop"
+    uvicorn.run("app:app", host="0.0.0.0", port=int(os.getenv("PORT", 8000)), log_level=settings.log_level, loop=loop)
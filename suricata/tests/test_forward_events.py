@@ -0,0 +1,69 @@
+import asyncio
+import os
+import sys
+import socket
+
+import aiohttp
+from aiohttp import web
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import app
+from app import _enqueue, forward_events, settings, stats
+
+
+def find_free_port():
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(("127.0.0.1", 0))
+    addr, port = s.getsockname()
+    s.close()
+    return port
+
+
+async def test_forward_events_batches_queue():
+    received = []
+
+    async def handler(request):
+        data = await request.json()
+        received.append(data)
+        return web.Response(text="ok")
+
+    port = find_free_port()
+    server = web.Application()
+    server.router.add_post("/receive", handler)
+    runner = web.AppRunner(server)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+
+    settings.target_url = f"http://127.0.0.1:{port}/receive"
+    settings.batch_size = 2
+    settings.batch_interval = 0.2
+
+    queue = asyncio.Queue()
+    for i in range(3):
+        queue.put_nowait({"i": i})
+
+    async with aiohttp.ClientSession() as session:
+        app.http_session = session
+        task = asyncio.create_task(forward_events(queue))
+        # The first batch is sent when full, the remainder after batch_interval
+        await asyncio.sleep(0.5)
+        task.cancel()
+
+    assert received == [[{"i": 0}, {"i": 1}], [{"i": 2}]]
+
+    await runner.cleanup()
+
+
+async def test_enqueue_drops_oldest_when_full():
+    stats.dropped = 0
+    queue = asyncio.Queue(maxsize=3)
+    _enqueue(queue, [{"i": i} for i in range(5)])
+
+    assert [queue.get_nowait()["i"] for _ in range(queue.qsize())] == [2, 3, 4]
+    assert stats.dropped == 2
+
+
+if __name__ == "__main__":
+    asyncio.run(test_forward_events_batches_queue())
+    asyncio.run(test_enqueue_drops_oldest_when_full())
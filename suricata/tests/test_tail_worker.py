@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import app
+from app import _tail_worker, settings
+
+
+def start_worker(queue):
+    stop = threading.Event()
+    task = asyncio.create_task(asyncio.to_thread(_tail_worker, asyncio.get_running_loop(), queue, stop))
+    return stop, task
+
+
+async def wait_for_events(queue, count, timeout=5.0):
+    async with asyncio.timeout(timeout):
+        while queue.qsize() < count:
+            await asyncio.sleep(0.05)
+    return [queue.get_nowait() for _ in range(queue.qsize())]
+
+
+def append(path, text):
+    with open(path, "a") as f:
+        f.write(text)
+
+
+async def test_tail_worker_follows_appends_and_rotation(tmp_path):
+    path = tmp_path / "eve.json"
+    path.write_text(json.dumps({"event_type": "old"}) + "\n")
+    settings.eve_file_path = str(path)
+    settings.batch_interval = 0.1
+    settings.read_interval = 0.05
+
+    queue = asyncio.Queue()
+    stop, task = start_worker(queue)
+    # Let the worker open the file and seek to its end
+    await asyncio.sleep(0.3)
+
+    # A line split across two writes is only parsed once it is complete
+    append(path, '{"event_type":"alert","i":0}\n{"event_type":"alert","i":"sp')
+    await asyncio.sleep(0.3)
+    append(path, 'lit"}\n')
+    events = await wait_for_events(queue, 2)
+
+    # Rename rotation: the new file at the same path is read from its beginning
+    os.rename(path, tmp_path / "eve.json.1")
+    path.write_text('{"event_type":"alert","i":1}\n')
+    events += await wait_for_events(queue, 1)
+
+    stop.set()
+    async with asyncio.timeout(5.0):
+        await task
+
+    assert [ev["i"] for ev in events] == [0, "split", 1]
+
+
+async def test_tail_worker_event_type_filter(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "EVENT_TYPES", frozenset({"alert"}))
+    monkeypatch.setattr(app, "EVENT_TYPE_NEEDLES", (b'"event_type":"alert"',))
+    path = tmp_path / "eve.json"
+    path.write_text("")
+    settings.eve_file_path = str(path)
+    settings.batch_interval = 0.1
+    settings.read_interval = 0.05
+
+    queue = asyncio.Queue()
+    stop, task = start_worker(queue)
+    await asyncio.sleep(0.3)
+
+    append(path, "".join(line + "\n" for line in [
+        '{"event_type":"flow","i":0}',
+        # Matches the prefilter through a nested field but is not an alert
+        '{"event_type":"flow","i":1,"x":{"event_type":"alert"}}',
+        '{"event_type":"alert","i":2}',
+        '{"event_type":"alert","i":3}',
+    ]))
+    events = await wait_for_events(queue, 2)
+
+    stop.set()
+    async with asyncio.timeout(5.0):
+        await task
+
+    assert [ev["i"] for ev in events] == [2, 3]
+
+
+async def test_tail_worker_error_before_first_read_keeps_position(tmp_path, monkeypatch):
+    path = tmp_path / "eve.json"
+    path.write_text("".join(json.dumps({"event_type": "old", "i": i}) + "\n" for i in range(100)))
+    settings.eve_file_path = str(path)
+    settings.batch_interval = 0.1
+    settings.read_interval = 0.05
+
+    idle_waits = app.idle_waits
+    failed = []
+
+    def failing_once(file_path, stop):
+        # e.g. watchfiles failing to add an inotify watch
+        if not failed:
+            failed.append(True)
+            raise OSError("inotify watch limit reached")
+        yield from idle_waits(file_path, stop)
+
+    monkeypatch.setattr(app, "idle_waits", failing_once)
+
+    queue = asyncio.Queue()
+    stop, task = start_worker(queue)
+    # The worker waits 1s after the error before reopening
+    await asyncio.sleep(1.5)
+
+    append(path, '{"event_type":"alert","i":"new"}\n')
+    events = await wait_for_events(queue, 1)
+
+    stop.set()
+    async with asyncio.timeout(5.0):
+        await task
+
+    assert failed
+    assert [ev["i"] for ev in events] == ["new"]